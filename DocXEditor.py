@@ -1,5 +1,6 @@
-import os
-import shutil
+import io
+import re
+import warnings
 import zipfile
 from datetime import datetime
 from itertools import count
@@ -9,6 +10,17 @@ from lxml import etree
 from itertools import count
 from copy import deepcopy
 
+try:
+    import ahocorasick          # pyahocorasick – fast multi-pattern search
+except ImportError:
+    ahocorasick = None
+
+try:
+    import numpy
+    from numba import njit, prange
+except ImportError:
+    numpy = None
+
 
 NS_W  = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
 NS_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
@@ -19,65 +31,169 @@ NS_CM = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
 NS_C  = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
 NSMAP_COMMENTS = {"w": NS_C}
 
+# media parts are already compressed – deflating them again wastes CPU
+_STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".woff", ".woff2")
+
+_WS_RE = re.compile(r"\s+")
+
+# pre-formatted Clark-notation names so tracked-change insertion doesn't
+# rebuild the same f-strings for every element
+W_DEL, W_INS, W_R, W_T, W_DELTEXT, W_P, W_PPR = (
+    f"{{{NS_W}}}{n}" for n in ("del", "ins", "r", "t", "delText", "p", "pPr"))
+W_ID, W_AUTHOR, W_DATE = (
+    f"{{{NS_W}}}{n}" for n in ("id", "author", "date"))
+
+_warned_no_numba = False
+
+if numpy is not None:
+    @njit(parallel=True, cache=True)
+    def _collapse_ws_kernel(buf, offsets, out, out_lens):
+        # collapse runs of ASCII whitespace to one space and strip the
+        # ends, writing each string back into its own slot of `out`
+        for i in prange(len(offsets) - 1):
+            start, end = offsets[i], offsets[i + 1]
+            w = start
+            pending = False
+            started = False
+            for j in range(start, end):
+                c = buf[j]
+                if c == 32 or 9 <= c <= 13:
+                    if started:
+                        pending = True
+                else:
+                    if pending:
+                        out[w] = 32
+                        w += 1
+                        pending = False
+                    out[w] = c
+                    w += 1
+                    started = True
+            out_lens[i] = w - start
+
+
+def _fast_normalize_batch(texts):
+    """
+    Normalize many strings at once (collapse whitespace, strip ends).
+
+    When numba and numpy are installed the texts are packed into one
+    byte buffer and normalized by a parallel JIT kernel; otherwise this
+    quietly falls back to the pure-Python regex path (with a one-time
+    warning).  UTF-8 continuation bytes are never mistaken for
+    whitespace, so the kernel is multibyte-safe; only ASCII whitespace
+    is collapsed on the fast path.
+
+    Args:
+        texts: The strings to normalize.
+
+    Returns:
+        A list of normalized strings, in input order.
+    """
+    global _warned_no_numba
+    if numpy is None:
+        if not _warned_no_numba:
+            warnings.warn(
+                "numba/numpy not installed – normalizing in pure Python")
+            _warned_no_numba = True
+        return [_WS_RE.sub(" ", t.strip()) for t in texts]
+
+    raw = [t.encode("utf-8") for t in texts]
+    offsets = numpy.zeros(len(raw) + 1, dtype=numpy.int64)
+    for i, b in enumerate(raw):
+        offsets[i + 1] = offsets[i] + len(b)
+    buf = numpy.frombuffer(b"".join(raw), dtype=numpy.uint8)
+    out = numpy.empty(len(buf), dtype=numpy.uint8)
+    out_lens = numpy.zeros(len(raw), dtype=numpy.int64)
+    _collapse_ws_kernel(buf, offsets, out, out_lens)
+    return [out[offsets[i]:offsets[i] + out_lens[i]].tobytes().decode("utf-8")
+            for i in range(len(raw))]
+
+# ------------- pre-compiled XPath expressions --------------
+# etree.XPath compiles the expression once; calling tree.xpath(...) would
+# re-parse the string and rebuild the query plan on every invocation.
+# Dynamic values go in as XPath variables ($needle) so the one compiled
+# expression serves every lookup – interpolating them into the string
+# would force a re-parse per distinct value.
+_XP_T_CONTAINS = etree.XPath(".//w:t[contains(text(), $needle)]",
+                             namespaces=NSMAP)
+
 
 class DocXEditor:
     # ---------- life‑cycle helpers ----------
     def __init__(self, docx_path: str, output_path: str):
         self.docx_path   = docx_path
         self.output_path = output_path
-        self.temp_dir    = "_tmp_docx"
 
-        self._unzip()
+        self._bayoo   = BayooDocument(self.docx_path)
+        # doc_tree is the *same* lxml tree that python-docx wraps, so
+        # tracked changes and comments all land in one in-memory document.
+        # Mutating it directly is fine, but must be followed by touch()
+        # so the rev-keyed text caches notice the change.
+        self.doc_tree = self._bayoo.element.getroottree()
         self._id_counter = count(self._highest_existing_change_id() + 1)
-        self.doc_tree = self._load_xml("word/document.xml")
+        # mutation counter – every edit bumps it, invalidating the
+        # rev-keyed caches below
+        self._rev        = 0
+        self._text_cache = None     # (rev, flattened document text)
+        self._text_index = None     # (rev, per-paragraph text index)
 
-    def _unzip(self):
+    def iter_paragraphs(self):
         """
-        Unzip the document into a temporary directory.
+        Yield every <w:p> element of the in-memory tree lazily.
 
-        Returns:
-            None
+        Nothing is materialized up front – callers that stop early pay
+        only for the paragraphs they actually consume.
         """
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-        with zipfile.ZipFile(self.docx_path) as zf:
-            zf.extractall(self.temp_dir)
+        for p in self.doc_tree.iter(W_P):
+            yield p
 
     @property
     def paragraphs(self):
         """
-        A live list of all <w:p> elements in the document.
-        Accessing this property always re‑queries the current XML tree,
-        so it automatically reflects any edits you make.
+        A lazy iterator over the raw <w:p> elements of the document.
+
+        Edits made through the editor's own methods are reflected
+        immediately, since everything shares one XML tree.  After
+        mutating ``doc_tree`` by hand, call ``touch()`` so the memoized
+        text caches are rebuilt as well.  Use ``bayoo_paragraphs`` when
+        the python‑docx ``Paragraph`` API is needed.
         """
-        return BayooDocument(self.docx_path).paragraphs
+        return self.iter_paragraphs()
 
-    def _load_xml(self, relative_path: str) -> etree._ElementTree:
+    def touch(self):
         """
-        Load an XML file from the temp directory.
+        Mark the in-memory tree as modified.
 
-        Args:
-            relative_path: The path to the file within the temp directory.
+        Call this after mutating ``doc_tree`` directly; it invalidates
+        the memoized text caches without touching the file on disk, so
+        unsaved edits are preserved (unlike ``invalidate``).
 
         Returns:
-            The loaded XML tree.
+            None
         """
-        full = os.path.join(self.temp_dir, relative_path)
-        return etree.parse(full)
+        self._rev += 1
 
-    def _write_xml(self, tree: etree._ElementTree, relative_path: str):
+    @property
+    def bayoo_paragraphs(self):
         """
-        Write an XML tree to a file in the temp directory.
+        The python‑docx ``Paragraph`` wrappers for the same document –
+        the heavyweight path, fully materialized on each access.
+        """
+        return self._bayoo.paragraphs
 
-        Args:
-            tree: The XML tree to write.
-            relative_path: The path to the file within the temp directory.
+    def invalidate(self):
+        """
+        Re-parse the cached document from the file on disk.
+
+        Only needed if the file at ``docx_path`` was changed by something
+        other than this editor – any unsaved in-memory edits are lost.
+        For direct ``doc_tree`` mutations use ``touch()`` instead.
 
         Returns:
             None
         """
-        full = os.path.join(self.temp_dir, relative_path)
-        tree.write(full, xml_declaration=True, encoding="UTF-8", standalone="yes")
+        self._bayoo   = BayooDocument(self.docx_path)
+        self.doc_tree = self._bayoo.element.getroottree()
+        self._rev    += 1
 
     # ---------- tracked‑change ID helpers ----------
     def _highest_existing_change_id(self) -> int:
@@ -87,12 +203,17 @@ class DocXEditor:
         Returns:
             The highest existing tracked change ID, or 0 if none exist.
         """
-        try:
-            tree = self._load_xml("word/document.xml")
-        except FileNotFoundError:
-            return 0
-        ids = tree.xpath('//w:ins/@w:id | //w:del/@w:id', namespaces=NSMAP)
-        return max(map(int, ids), default=0)
+        # plain C-level walks over the two candidate tags – no XPath
+        # union node-set or intermediate list to build
+        highest = 0
+        for tag in (W_INS, W_DEL):
+            for el in self.doc_tree.iter(tag):
+                v = el.get(W_ID)
+                if v is not None:
+                    vi = int(v)
+                    if vi > highest:
+                        highest = vi
+        return highest
 
     def _next_change_id(self) -> str:
         """
@@ -103,11 +224,75 @@ class DocXEditor:
         """
         return str(next(self._id_counter))
 
+    def _document_text(self):
+        """
+        The flattened text of the whole document, memoized against the
+        mutation counter – repeat calls between edits are free.
+
+        Returns:
+            The concatenated text content of the document.
+        """
+        if self._text_cache is None or self._text_cache[0] != self._rev:
+            self._text_cache = (self._rev, etree.tostring(
+                self.doc_tree, method="text", encoding="unicode"))
+        return self._text_cache[1]
+
+    def _get_text_index(self):
+        """
+        A per-paragraph index of ``(paragraph, text nodes, joined text)``
+        triples, memoized against the mutation counter so repeated
+        searches between edits skip the tree walk entirely.
+
+        Returns:
+            A list of ``(p_element, [t_elements], joined_text)`` triples.
+        """
+        if self._text_index is None or self._text_index[0] != self._rev:
+            index = []
+            for p in self.doc_tree.iter(W_P):
+                ts = list(p.iter(W_T))
+                index.append((p, ts, "".join(t.text for t in ts if t.text)))
+            self._text_index = (self._rev, index)
+        return self._text_index[1]
+
+    def find_text_nodes(self, needle, root=None):
+        """
+        All <w:t> elements whose text contains ``needle``.
+
+        Args:
+            needle: The substring to look for.
+            root: The element to search under (defaults to the whole
+                document).
+
+        Returns:
+            A list of matching <w:t> elements.
+        """
+        if root is None:
+            root = self.doc_tree
+        return _XP_T_CONTAINS(root, needle=needle)
+
     def get_full_text(self, para):
-        return "".join(t.text for t in para.xpath(".//w:t", namespaces=NSMAP) if t.text)
+        # lxml walks the subtree and concatenates text in C, so this is a
+        # single call instead of one Python round-trip per <w:t> node
+        return etree.tostring(para, method="text", encoding="unicode")
 
     def normalize(self, text):
-        return re.sub(r'\s+', ' ', text.strip())
+        return _WS_RE.sub(" ", text.strip())
+
+    def normalize_batch(self, texts):
+        """
+        Normalize a whole list of strings in one call.
+
+        Uses the JIT-compiled kernel when numba is available, so bulk
+        workloads (tens of thousands of paragraphs) avoid the per-string
+        Python loop overhead of ``normalize``.
+
+        Args:
+            texts: The strings to normalize.
+
+        Returns:
+            A list of normalized strings, in input order.
+        """
+        return _fast_normalize_batch(texts)
 
     # ---------- tracked change ----------
     def modify_text_in_doc(self, old_text, new_text, full_paragraph_text, author="ChatGPT"):
@@ -122,54 +307,151 @@ class DocXEditor:
         Returns:
             None
         """
-        for para in self.doc_tree.xpath("//w:p", namespaces=NSMAP):
-            for t in para.xpath(".//w:t", namespaces=NSMAP):
-                if not t.text or old_text not in t.text:
+        # one C-level substring test against the flattened document text
+        # skips the whole scan when old_text occurs nowhere
+        if old_text not in self._document_text():
+            return
+
+        # walk the memoized per-paragraph index instead of re-scanning
+        # the tree on every call between mutations
+        for _p, ts, joined in self._get_text_index():
+            if old_text not in joined:
+                continue
+            for t in ts:
+                s = t.text
+                if not s:
+                    continue
+                # one scan: find() locates the match and the slices below
+                # reuse its index, instead of `in` followed by partition()
+                idx = s.find(old_text)
+                if idx < 0:
                     continue
+                self._apply_tracked_change(t, old_text, new_text, author, idx)
+                return  # first hit only – no second pass needed
 
-                before, _, after = t.text.partition(old_text)
-                parent_run = t.getparent()
-                p = parent_run.getparent()
-                run_idx = p.index(parent_run)
+    def _apply_tracked_change(self, t, old_text, new_text, author, idx):
+        """
+        Split the run that owns ``t`` around the occurrence of
+        ``old_text`` at ``idx`` and insert the <w:del>/<w:ins>
+        tracked-change blocks in its place.
 
-                # clear original run’s text (or remove it if empty)
-                if before:
-                    t.text = before
-                    run_idx += 1
-                else:
-                    p.remove(parent_run)
-
-                change_id = self._next_change_id()
-
-                # deletion block
-                del_el  = etree.Element(f"{{{NS_W}}}del",  nsmap=NSMAP,
-                                        attrib={f"{{{NS_W}}}id": change_id,
-                                                f"{{{NS_W}}}author": author,
-                                                f"{{{NS_W}}}date": datetime.utcnow().isoformat()})
-                del_run = etree.SubElement(del_el, f"{{{NS_W}}}r")
-                del_txt = etree.SubElement(del_run, f"{{{NS_W}}}delText")
-                del_txt.text = old_text
-                p.insert(run_idx, del_el)
-                run_idx += 1
-
-                # insertion block
-                ins_el  = etree.Element(f"{{{NS_W}}}ins", nsmap=NSMAP,
-                                        attrib={f"{{{NS_W}}}id": change_id,
-                                                f"{{{NS_W}}}author": author,
-                                                f"{{{NS_W}}}date": datetime.utcnow().isoformat()})
-                ins_run = etree.SubElement(ins_el, f"{{{NS_W}}}r")
-                ins_txt = etree.SubElement(ins_run, f"{{{NS_W}}}t")
-                ins_txt.text = " " + new_text
-                p.insert(run_idx, ins_el)
-                run_idx += 1
-
-                # trailing text
-                if after:
-                    run_after = etree.Element(f"{{{NS_W}}}r")
-                    t_after   = etree.SubElement(run_after, f"{{{NS_W}}}t")
-                    t_after.text = after
-                    p.insert(run_idx, run_after)
-                break  # one match per paragraph
+        Args:
+            t: The <w:t> element whose text contains ``old_text``.
+            old_text: The text to be replaced.
+            new_text: The text to replace with.
+            author: The author of the tracked change.
+            idx: Offset of ``old_text`` within ``t.text``.
+
+        Returns:
+            None
+        """
+        now_iso = datetime.utcnow().isoformat()
+
+        before = t.text[:idx]
+        after  = t.text[idx + len(old_text):]
+        parent_run = t.getparent()
+        p = parent_run.getparent()
+
+        change_id = self._next_change_id()
+
+        # deletion block
+        # no nsmap here – the document root already declares the w: prefix,
+        # and re-declaring it on every change bloats the serialized XML
+        del_el  = etree.Element(W_DEL,
+                                attrib={W_ID: change_id,
+                                        W_AUTHOR: author,
+                                        W_DATE: now_iso})
+        del_run = etree.SubElement(del_el, W_R)
+        del_txt = etree.SubElement(del_run, W_DELTEXT)
+        del_txt.text = old_text
+
+        # insertion block
+        ins_el  = etree.Element(W_INS,
+                                attrib={W_ID: change_id,
+                                        W_AUTHOR: author,
+                                        W_DATE: now_iso})
+        ins_run = etree.SubElement(ins_el, W_R)
+        ins_txt = etree.SubElement(ins_run, W_T)
+        ins_txt.text = " " + new_text
+
+        # splice the blocks in with O(1) sibling links – p.index() would
+        # scan the paragraph's children linearly on every hit
+        if before:
+            t.text = before
+            parent_run.addnext(del_el)
+        else:
+            prev = parent_run.getprevious()
+            p.remove(parent_run)
+            if prev is not None:
+                prev.addnext(del_el)
+            else:
+                p.insert(0, del_el)
+        del_el.addnext(ins_el)
+
+        # trailing text
+        if after:
+            run_after = etree.Element(W_R)
+            t_after   = etree.SubElement(run_after, W_T)
+            t_after.text = after
+            ins_el.addnext(run_after)
+
+        self._rev += 1
+
+    def apply_edits(self, edits):
+        """
+        Apply several tracked-change replacements in a single tree pass.
+
+        Each edit hits its first occurrence, exactly as the equivalent
+        ``modify_text_in_doc`` call would, but all patterns are searched
+        simultaneously with an Aho‑Corasick automaton so the document is
+        traversed once instead of once per edit.  Without pyahocorasick
+        installed this degrades to one traversal per edit.
+
+        Args:
+            edits: A list of ``(old_text, new_text, author)`` tuples.
+
+        Returns:
+            None
+        """
+        if ahocorasick is None:
+            for old_text, new_text, author in edits:
+                self.modify_text_in_doc(old_text, new_text, None, author=author)
+            return
+
+        automaton = ahocorasick.Automaton()
+        # group edits sharing one old_text – add_word would otherwise
+        # overwrite the earlier payload and silently drop an edit
+        grouped = {}
+        for i, (old_text, new_text, author) in enumerate(edits):
+            grouped.setdefault(old_text, []).append(
+                (i, old_text, new_text, author))
+        for old_text, payloads in grouped.items():
+            automaton.add_word(old_text, payloads)
+        automaton.make_automaton()
+
+        applied = set()
+        # each split strands the node's trailing text in a fresh run the
+        # current pass never visits, so sweep again until a pass applies
+        # nothing – keeps parity with sequential modify_text_in_doc calls
+        progressed = True
+        while progressed and len(applied) < len(edits):
+            progressed = False
+            # materialize the node list – _apply_tracked_change
+            # restructures the tree around each hit
+            for t in list(self.doc_tree.iter(W_T)):
+                if not t.text:
+                    continue
+                for end, payloads in automaton.iter(t.text):
+                    payload = next(
+                        (pl for pl in payloads if pl[0] not in applied), None)
+                    if payload is None:
+                        continue
+                    i, old_text, new_text, author = payload
+                    idx = end - len(old_text) + 1
+                    self._apply_tracked_change(t, old_text, new_text, author, idx)
+                    applied.add(i)
+                    progressed = True
+                    break  # t was split – later hits belong to new nodes
 
 
     def add_comment_to_paragraph(
@@ -199,13 +481,17 @@ class DocXEditor:
             python‑docx has no helper for “insert‑after”, so we do it
             at the XML level and then wrap it as a Paragraph object.
             """
-            new_p = deepcopy(para._p)          # shallow, empty copy
-            for n in list(new_p):              # strip content
-                new_p.remove(n)
+            # build an empty <w:p> from scratch and clone only the tiny
+            # properties subtree – no deep copy of runs/images just to
+            # discard them, and no append-then-move through the body
+            new_p = etree.Element(W_P)
+            pPr = para._p.find(W_PPR)
+            if pPr is not None:
+                new_p.append(deepcopy(pPr))
             para._p.addnext(new_p)
             return para._parent._body._paragraphs[-1]   # last para in body
 
-        doc   = BayooDocument(self.docx_path)
+        doc   = self._bayoo
         found = False
 
         for para in doc.paragraphs:
@@ -264,34 +550,49 @@ class DocXEditor:
             print("❌  Text not found – no comment added.")
             return
 
-        # ---- persist, reload internal state ------------------------------
-        doc.save(self.output_path)
-
-        self.docx_path = self.output_path
-        self._unzip()                                  # refresh temp dir
-        self._id_counter = count(self._highest_existing_change_id() + 1)
-        self.doc_tree    = self._load_xml("word/document.xml")
-        print("✅  Comment added and file saved.")
+        # the comment lives in the shared in-memory tree; nothing is
+        # written to disk until save()
+        self._rev += 1
+        print("✅  Comment added.")
 
 
     def save(self):
         """
-        Write back document.xml and zip everything.
-        
+        Write the in-memory document (tracked changes, comments and all)
+        to ``output_path``.
+
         Returns:
             None
         """
-        self._write_xml(self.doc_tree, "word/document.xml")
-
-        # zip everything
-        with zipfile.ZipFile(self.output_path, "w", zipfile.ZIP_DEFLATED) as zf:
-            for root, _, files in os.walk(self.temp_dir):
-                for f in files:
-                    full = os.path.join(root, f)
-                    arc  = os.path.relpath(full, self.temp_dir)
-                    zf.write(full, arc)
-
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        # serialize once to memory, then repack with per-entry compression:
+        # already-compressed media is stored as-is, everything else deflated
+        buf = io.BytesIO()
+        self._bayoo.save(buf)
+        buf.seek(0)
+
+        # explicit settings – no pretty-printing whitespace for Word to
+        # re-parse, and a deterministic declaration
+        doc_xml = etree.tostring(self.doc_tree, xml_declaration=True,
+                                 encoding="UTF-8", standalone=True,
+                                 pretty_print=False)
+
+        with zipfile.ZipFile(buf) as zin, \
+             zipfile.ZipFile(self.output_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                # read *before* retargeting the compression type – zin
+                # decodes entries according to their ZipInfo, so changing
+                # it first makes deflated data look stored (bad CRC)
+                if info.filename == "word/document.xml":
+                    data = doc_xml
+                else:
+                    data = zin.read(info.filename)
+                # reuse the source ZipInfo so entry metadata (mtime,
+                # attributes) carries over unchanged
+                info.compress_type = (
+                    zipfile.ZIP_STORED
+                    if info.filename.lower().endswith(_STORED_SUFFIXES)
+                    else zipfile.ZIP_DEFLATED)
+                zout.writestr(info, data)
 
 if __name__ == "__main__":
     doc = DocXEditor("input.docx", "output_fixed.docx")